@@ -3,6 +3,7 @@ Generates a table of contents for a markdown file.
 If an existing TOC is present, it updates it, otherwise, it inserts a new one.
 """
 
+import functools
 import re
 import string
 import sys
@@ -14,6 +15,21 @@ import click
 # This pattern matches 2nd and 3rd level headers, but ignores 1st level headers.
 HEADER_PATTERN = re.compile(r"^(#{2,3}) (.*)$")
 
+# Markers delimiting the TOC, and the header placed inside it.
+TOC_START_MARKER = "<!-- TOC -->"
+TOC_END_MARKER = "<!-- /TOC -->"
+TOC_HEADER = "## Table of Contents"
+
+# Both markers are told apart from other lines by their first character.
+TOC_MARKER_CHAR = TOC_START_MARKER[0]
+assert TOC_END_MARKER[0] == TOC_MARKER_CHAR
+
+# Removes punctuation from titles, except hyphens and underscores.
+PUNCTUATION_TABLE = str.maketrans(
+    "", "", string.punctuation.replace("-", "").replace("_", "")
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
 
 @click.command()
 @click.version_option()
@@ -30,12 +46,12 @@ def cli(filepath):
         click.echo(f"Error: {filepath} is not a Markdown file.", err=True)
         sys.exit(1)
 
-    full_file, headers, toc_line_start, toc_line_end = parse_file(filepath)
+    content, headers, toc_start, toc_end = parse_file(filepath)
     toc = generate_toc(headers)
 
     # Updates TOC
-    if toc_line_start is not None and toc_line_end is not None:
-        update_toc(full_file, toc, toc_line_start, toc_line_end, filepath)
+    if toc_start is not None and toc_end is not None:
+        update_toc(content, toc, toc_start, toc_end, filepath)
     # Inserts TOC
     else:
         print("\n".join(toc))
@@ -64,68 +80,91 @@ def parse_file(filepath):
     """
     Parses the specified Markdown file.
 
+    The file is kept as a single string; the existing TOC is located by
+    character offsets into it rather than by keeping a list of every line.
+
     Args:
         filepath (str): The path to the markdown file.
 
     Returns:
         tuple: A tuple containing:
-            full_file (list): A list of all lines in the file.
+            content (str): The whole content of the file.
             headers (list): A list of all headers in the file.
-            toc_line_start (int): The line number where the TOC starts.
-            toc_line_end (int): The line number where the TOC ends.
+            toc_start (int): The offset where the TOC start line begins.
+            toc_end (int): The offset right after the TOC end line.
     """
-    full_file = []  # Stores all lines of the file
     headers = []  # Stores all headers found in the file
 
-    # TOC start and end line numbers
-    toc_line_start = None
-    toc_line_end = None
+    # TOC start and end offsets
+    toc_start = None
+    toc_end = None
 
     # Flag for code blocks
     is_in_code_block = False
 
     with safe_read(filepath) as file:
-        for line_number, line in enumerate(file):
-            full_file.append(line)
+        content = file.read()
+
+    # Offsets of the current line in `content`
+    line_start = 0
+    content_length = len(content)
 
-            # Tracks if we're in a code block
-            if line.startswith("```"):
-                is_in_code_block = not is_in_code_block
-                continue
+    while line_start < content_length:
+        newline = content.find("\n", line_start)
+        line_end = content_length if newline == -1 else newline + 1
 
-            # Ignores code blocks and existing TOC
-            if is_in_code_block or line.startswith("## Table of Contents"):
-                continue
+        # Tracks if we're in a code block
+        if content.startswith("```", line_start):
+            is_in_code_block = not is_in_code_block
 
-            # Finds headers
-            header_match = HEADER_PATTERN.match(line)
-            if header_match:
-                headers.append(header_match.group(0))
+        # Ignores code blocks
+        elif not is_in_code_block:
+            # Headers start with "#" and TOC markers with TOC_MARKER_CHAR, so
+            # the first character rules out most lines before any prefix check.
+            first_char = content[line_start]
 
-            # Finds TOC start and end line numbers
-            if line.startswith("<!-- TOC -->"):
-                toc_line_start = line_number
-            if line.startswith("<!-- /TOC -->"):
-                toc_line_end = line_number
+            if first_char == "#":
+                line = content[line_start:line_end]
 
-    return full_file, headers, toc_line_start, toc_line_end
+                # Finds headers, ignoring existing TOC
+                if not line.startswith(TOC_HEADER):
+                    header_match = HEADER_PATTERN.match(line)
+                    if header_match:
+                        headers.append(header_match.group(0))
 
+            # Finds TOC start and end offsets
+            elif first_char == TOC_MARKER_CHAR:
+                if content.startswith(TOC_START_MARKER, line_start):
+                    toc_start = line_start
+                elif content.startswith(TOC_END_MARKER, line_start):
+                    toc_end = line_end
 
+        line_start = line_end
+
+    return content, headers, toc_start, toc_end
+
+
+@functools.lru_cache(maxsize=4096)
 def generate_link_from_title(title):
     """
     Generates a link anchor from a given title.
 
+    Results are cached, so titles repeated within a document are only
+    converted once.
+
     Args:
         title (str): The title from which to generate the link.
 
     Returns:
         str: The generated link.
     """
-    # Ignores hyphens and underscores
-    punctuation = string.punctuation.replace("-", "").replace("_", "")
+    link = title.casefold().translate(PUNCTUATION_TABLE).strip()
+    link = WHITESPACE_PATTERN.sub("-", link)
+
+    # ASCII titles are left unchanged by the normalization below
+    if link.isascii():
+        return link
 
-    link = title.casefold().translate(str.maketrans("", "", punctuation)).strip()
-    link = re.sub(r"\s+", "-", link)
     return (
         unicodedata.normalize("NFKD", link)
         .encode("ascii", "ignore")
@@ -143,7 +182,7 @@ def generate_toc(headers):
     Returns:
         list: A list of lines that make up the TOC.
     """
-    toc = ["## Table of Contents\n"]
+    toc = [f"{TOC_HEADER}\n"]
 
     for heading in headers:
         level = heading.count("#")
@@ -151,28 +190,28 @@ def generate_toc(headers):
         link = generate_link_from_title(title)
         toc.append("    " * (level - 2) + f"1. [{title}](#{link})")
 
-    toc.insert(0, "<!-- TOC -->")
-    toc.append("<!-- /TOC -->")
+    toc.insert(0, TOC_START_MARKER)
+    toc.append(TOC_END_MARKER)
 
     return toc
 
 
-def update_toc(full_file, toc, toc_line_start, toc_line_end, filepath):
+def update_toc(content, toc, toc_start, toc_end, filepath):
     """
     Updates the existing TOC with the new one.
 
     Args:
-        full_file (list): A list of all lines in the file.
+        content (str): The whole content of the file.
         toc (list): A list of lines that make up the TOC.
-        toc_start (int): The line number where the TOC starts.
-        toc_end (int): The line number where the TOC ends.
+        toc_start (int): The offset where the TOC start line begins.
+        toc_end (int): The offset right after the TOC end line.
         filepath (str): The path to the file.
     """
     with open(filepath, "w", encoding="UTF-8") as file:
-        file.writelines(full_file[:toc_line_start])
+        file.write(content[:toc_start])
         for line in toc:
             file.write(line + "\n")
-        file.writelines(full_file[toc_line_end + 1 :])
+        file.write(content[toc_end:])
 
 
 if __name__ == "__main__":